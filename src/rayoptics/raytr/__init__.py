@@ -20,10 +20,13 @@
 """
 
 from collections import namedtuple
+import operator
+
+import numpy as np
 
 RayPkg = namedtuple('RayPkg', ['ray', 'op', 'wvl'])
 RayPkg.__doc__ = "Ray and optical path length, plus wavelength"
-RayPkg.ray.__doc__ = "list of RaySegs"
+RayPkg.ray.__doc__ = "list of RaySegs or a RayArray"
 RayPkg.op.__doc__ = "optical path length between pupils"
 RayPkg.wvl.__doc__ = "wavelength (in nm) that the ray was traced in"
 
@@ -33,3 +36,61 @@ RaySeg.p.__doc__ = "the point of incidence"
 RaySeg.d.__doc__ = "ray direction cosine following the interface"
 RaySeg.dst.__doc__ = "geometric distance to next point of incidence"
 RaySeg.nrml.__doc__ = "surface normal vector at the point of incidence"
+
+
+class RayArray:
+    """ ray segment data for a ray, stored as a struct of arrays
+
+    The point, direction and normal data for all of the interfaces are held
+    in (N, 3) arrays, and the distances in an (N,) array, so that operations
+    over a whole ray can be done with array arithmetic.
+
+    A RayArray can also be used like the list of RaySegs it replaces:
+    indexing with an integer returns a :obj:`RaySeg`, slicing returns a
+    RayArray and iteration yields RaySeg tuples.
+
+    Attributes:
+        pts: the points of incidence, (N, 3)
+        dirs: the ray direction cosines following the interfaces, (N, 3)
+        dsts: the geometric distances to the next points of incidence, (N,)
+        nrmls: the surface normal vectors at the points of incidence, (N, 3)
+    """
+
+    def __init__(self, pts, dirs, dsts, nrmls):
+        self.pts = pts
+        self.dirs = dirs
+        self.dsts = dsts
+        self.nrmls = nrmls
+
+    @classmethod
+    def from_ray(cls, ray):
+        """ return a RayArray for ray, a sequence of ray segments """
+        if isinstance(ray, cls):
+            return ray
+        return cls(np.array([seg[0] for seg in ray]).reshape(-1, 3),
+                   np.array([seg[1] for seg in ray]).reshape(-1, 3),
+                   np.array([seg[2] for seg in ray], dtype=float),
+                   np.array([seg[3] for seg in ray]).reshape(-1, 3))
+
+    def __repr__(self):
+        return "{}({} segments)".format(type(self).__name__, len(self))
+
+    def __len__(self):
+        return len(self.dsts)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return RayArray(self.pts[key], self.dirs[key],
+                            self.dsts[key], self.nrmls[key])
+        try:
+            i = operator.index(key)
+        except TypeError:
+            raise TypeError("RayArray indices must be integers or slices, "
+                            "not {}".format(type(key).__name__)) from None
+        if i < -len(self) or i >= len(self):
+            raise IndexError("RayArray index out of range")
+        return RaySeg(self.pts[i], self.dirs[i], self.dsts[i], self.nrmls[i])
+
+    def __iter__(self):
+        for seg in zip(self.pts, self.dirs, self.dsts, self.nrmls):
+            yield RaySeg(*seg)
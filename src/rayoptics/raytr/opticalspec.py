@@ -603,6 +603,18 @@ class Field:
                 vig_pupil[1] *= (1.0 - self.vuy)
         return vig_pupil
 
+    def apply_vignetting_batch(self, pupils):
+        """ returns a new array of the vignetted pupils, shape (N, 2)
+
+        The vectorized version of :meth:`apply_vignetting`.
+        """
+        vig_pupils = np.array(pupils, dtype=float)
+        vig_pupils[:, 0] *= np.where(vig_pupils[:, 0] < 0.0,
+                                     1.0 - self.vlx, 1.0 - self.vux)
+        vig_pupils[:, 1] *= np.where(vig_pupils[:, 1] < 0.0,
+                                     1.0 - self.vly, 1.0 - self.vuy)
+        return vig_pupils
+
 
 class FocusRange:
     """ Focus range specification
@@ -56,6 +56,8 @@ def trace(seq_model, pt0, dir0, wvl, **kwargs):
         dir0: starting direction cosines in coords of first interface
         wvl: wavelength in nm
         eps: accuracy tolerance for surface intersection calculation
+        path: optional precomputed path for **wvl**, e.g. from
+              :meth:`~.SequentialModel.cached_path`
 
     Returns:
         (**ray**, **op_delta**, **wvl**)
@@ -73,7 +75,8 @@ def trace(seq_model, pt0, dir0, wvl, **kwargs):
           optical axis
         - **wvl** - wavelength (in nm) that the ray was traced in
     """
-    path = seq_model.path(wvl)
+    path = kwargs.pop('path', None)
+    path = seq_model.path(wvl) if path is None else iter(path)
     kwargs['first_surf'] = kwargs.get('first_surf', 1)
     kwargs['last_surf'] = kwargs.get('last_surf',
                                      seq_model.get_num_surfaces()-2)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Tests for chief ray aiming at the center of the stop surface
+
+"""
+
+import unittest
+from pathlib import Path
+
+import numpy.testing as npt
+
+import rayoptics as ro
+from rayoptics.gui.appcmds import open_model
+from rayoptics.raytr import trace
+
+
+class AimChiefRayTestCase(unittest.TestCase):
+    """ Aim the off-axis fields of bundled lenses.
+
+        The chief ray traced from the aim point must land on the center of
+        the stop surface. The tolerance is relative to the stop semi-diameter.
+    """
+    rel_tol = 1e-6
+
+    def check_aiming(self, filename):
+        root_pth = Path(ro.__file__).resolve().parent
+        opm = open_model(root_pth/filename)
+        sm = opm.seq_model
+        osp = opm.optical_spec
+        stop = sm.stop_surface
+        wvl = sm.central_wavelength()
+        atol = self.rel_tol*sm.ifcs[stop].surface_od()
+
+        off_axis = [fld for fld in osp.field_of_view.fields
+                    if fld.x != 0. or fld.y != 0.]
+        self.assertTrue(len(off_axis) > 0)
+        for fld in off_axis:
+            fld.aim_pt = trace.aim_chief_ray(opm, fld, wvl)
+            ray, op, wvl = trace.trace_base(opm, [0., 0.], fld, wvl)
+            npt.assert_allclose(ray[stop].p[:2], [0., 0.], rtol=0., atol=atol,
+                                err_msg='{}: field {}'.format(filename, fld))
+
+    def test_threemir(self):
+        self.check_aiming('codev/tests/threemir.seq')
+
+    def test_ag_dblgauss(self):
+        self.check_aiming('codev/tests/ag_dblgauss.seq')
+
+    def test_US007277232_Example04P(self):
+        self.check_aiming('optical/tests/US007277232_Example04P.roa')
+
+
+class NewtonTestCase(unittest.TestCase):
+    def test_root(self):
+        x = trace._newton_1d(lambda x, a: x*x - a, 1., 1e-4, args=(2.,))
+        self.assertAlmostEqual(x, 2.**0.5, places=9)
+
+    def test_flat_step(self):
+        # a step that doesn't change fct returns the starting estimate
+        x = trace._newton_1d(lambda x: 1., 0.5, 1e-4)
+        self.assertEqual(x, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Tests for intersect_2_lines
+
+"""
+
+import unittest
+import numpy as np
+import numpy.testing as npt
+
+from rayoptics.raytr.trace import intersect_2_lines
+
+
+def intersect_2_lines_np(P1, V1, P2, V2):
+    """ the numpy vector form of intersect_2_lines, used as a reference """
+    Vx = np.cross(V1, V2)
+    s = np.dot(np.cross(P2 - P1, V1), Vx)/np.dot(Vx, Vx)
+    return s
+
+
+class Intersect2LinesTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.lines = [(rng.normal(size=3), rng.normal(size=3),
+                       rng.normal(size=3), rng.normal(size=3))
+                      for i in range(20)]
+
+    def test_crossing(self):
+        P1, V1 = np.array([0., 1., 0.]), np.array([0., -0.1, 1.])
+        P2, V2 = np.array([0., -1., 2.]), np.array([0., 0.2, 1.])
+        s = intersect_2_lines(P1, V1, P2, V2)
+        npt.assert_allclose(s, intersect_2_lines_np(P1, V1, P2, V2),
+                            rtol=1e-14)
+        # s is measured along V2 from P2 to the intersection with line 1
+        npt.assert_allclose(P2 + s*V2, [0., 0.2, 8.], rtol=1e-14)
+
+    def test_skew(self):
+        for P1, V1, P2, V2 in self.lines:
+            npt.assert_allclose(intersect_2_lines(P1, V1, P2, V2),
+                                intersect_2_lines_np(P1, V1, P2, V2),
+                                rtol=1e-12)
+
+    def test_parallel(self):
+        P1, V1 = np.array([0., 1., 0.]), np.array([0., 0.1, 1.])
+        P2, V2 = np.array([0., -1., 2.]), np.array([0., 0.2, 2.])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            s = intersect_2_lines(P1, V1, P2, V2)
+            s_ref = intersect_2_lines_np(P1, V1, P2, V2)
+        self.assertTrue(np.isnan(s_ref))
+        self.assertTrue(np.isnan(s))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
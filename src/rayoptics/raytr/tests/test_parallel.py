@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Tests that tracing with n_workers matches the serial trace
+
+"""
+
+import unittest
+from pathlib import Path
+
+import numpy as np
+import numpy.testing as npt
+
+import rayoptics as ro
+from rayoptics.gui.appcmds import open_model
+from rayoptics.raytr import trace
+from rayoptics.raytr.traceerror import TraceError
+
+
+def keep_ray_result(pupil, ray_result):
+    # a dict isn't unpacked by np.array, so rays of different lengths and
+    #  TraceErrors can share the grid array
+    return {'pupil': pupil, 'ray_result': ray_result}
+
+
+class ParallelTraceTestCase(unittest.TestCase):
+    def setUp(self):
+        root_pth = Path(ro.__file__).resolve().parent
+        self.opm = open_model(root_pth/'codev/tests/ag_dblgauss.seq')
+        self.osp = self.opm.optical_spec
+
+    def check_ray(self, ray, ray_ref):
+        self.assertEqual(len(ray), len(ray_ref))
+        for seg, seg_ref in zip(ray, ray_ref):
+            for v, v_ref in zip(seg, seg_ref):
+                npt.assert_array_equal(v, v_ref)
+
+    def check_ray_result(self, ray_result, ray_result_ref):
+        if ray_result_ref is None:
+            self.assertIsNone(ray_result)
+        elif isinstance(ray_result_ref, TraceError):
+            self.assertIs(type(ray_result), type(ray_result_ref))
+            self.assertEqual(ray_result.surf, ray_result_ref.surf)
+            if ray_result_ref.ray_pkg is None:
+                self.assertIsNone(ray_result.ray_pkg)
+            else:
+                self.check_ray(ray_result.ray_pkg[0],
+                               ray_result_ref.ray_pkg[0])
+        else:
+            ray, op, wvl = ray_result
+            ray_ref, op_ref, wvl_ref = ray_result_ref
+            if isinstance(ray_ref, tuple):  # output_filter='last'
+                ray, ray_ref = [ray], [ray_ref]
+            self.check_ray(ray, ray_ref)
+            self.assertEqual(op, op_ref)
+            self.assertEqual(wvl, wvl_ref)
+
+    def test_trace_grid(self):
+        fld, wvl, foc = self.osp.lookup_fld_wvl_focus(2)
+        # the grid overfills the pupil so that some rays are blocked
+        grid_rng = [np.array([-1.2, -1.2]), np.array([1.2, 1.2]), 7]
+        for output_filter, rayerr_filter in ((None, None), ('last', 'full'),
+                                             (None, 'summary')):
+            grid = trace.trace_grid(self.opm, grid_rng, fld, wvl, foc,
+                                    img_filter=keep_ray_result, form='list',
+                                    output_filter=output_filter,
+                                    rayerr_filter=rayerr_filter)
+            grid_par = trace.trace_grid(self.opm, grid_rng, fld, wvl, foc,
+                                        img_filter=keep_ray_result,
+                                        form='list',
+                                        output_filter=output_filter,
+                                        rayerr_filter=rayerr_filter,
+                                        n_workers=2)
+            self.assertEqual(grid.shape, grid_par.shape)
+            num_errors = 0
+            for entry, entry_ref in zip(grid_par, grid):
+                npt.assert_array_equal(entry['pupil'], entry_ref['pupil'])
+                ray_result_ref = entry_ref['ray_result']
+                self.check_ray_result(entry['ray_result'], ray_result_ref)
+                if isinstance(ray_result_ref, TraceError):
+                    num_errors += 1
+            if rayerr_filter is not None:
+                self.assertTrue(num_errors > 0)
+
+    def test_trace_boundary_rays(self):
+        rayset = trace.trace_boundary_rays(self.opm)
+        rayset_par = trace.trace_boundary_rays(self.opm, n_workers=2)
+        self.assertEqual(len(rayset_par), len(rayset))
+        for rim_rays, rim_rays_ref in zip(rayset_par, rayset):
+            self.assertEqual(len(rim_rays), len(rim_rays_ref))
+            for ray_pkg, ray_pkg_ref in zip(rim_rays, rim_rays_ref):
+                self.check_ray_result(ray_pkg, ray_pkg_ref)
+
+    def test_trace_all_fields(self):
+        fset = trace.trace_all_fields(self.opm, as_dataframe=False)
+        fset_par = trace.trace_all_fields(self.opm, as_dataframe=False,
+                                          n_workers=2)
+        npt.assert_array_equal(fset_par, fset)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
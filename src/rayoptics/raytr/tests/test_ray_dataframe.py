@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Tests for the boundary ray |DataFrame| built by trace_all_fields
+
+"""
+
+import unittest
+from pathlib import Path
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+
+import rayoptics as ro
+from rayoptics.gui.appcmds import open_model
+from rayoptics.raytr import trace
+
+
+class RayDataFrameTestCase(unittest.TestCase):
+    """ Compare against frames from ray_df concatenated with pd.concat. """
+    def setUp(self):
+        root_pth = Path(ro.__file__).resolve().parent
+        self.opm = open_model(root_pth/'codev/tests/ag_dblgauss.seq')
+        self.osp = self.opm.optical_spec
+
+    def concat_field(self, fld, wvl):
+        pupil = self.osp.pupil
+        rdf_list = [trace.ray_df(trace.trace_base(self.opm, p, fld, wvl)[0])
+                    for p in pupil.pupil_rays]
+        return pd.concat(rdf_list, keys=pupil.ray_labels, names=['pupil'])
+
+    def check_frames(self, df, df_ref):
+        self.assertEqual(list(df.index.names), list(df_ref.index.names))
+        self.assertEqual(df.index.nlevels, df_ref.index.nlevels)
+        for lvl in range(df.index.nlevels):
+            self.assertEqual(list(df.index.get_level_values(lvl)),
+                             list(df_ref.index.get_level_values(lvl)))
+        self.assertEqual(list(df.columns), list(df_ref.columns))
+        npt.assert_array_equal(df['after_dst'].to_numpy(dtype=float),
+                               df_ref['after_dst'].to_numpy(dtype=float))
+        for col in ('inc_pt', 'after_dir', 'normal'):
+            npt.assert_array_equal(np.stack(df[col]), np.stack(df_ref[col]))
+
+    def test_trace_field(self):
+        fld, wvl, foc = self.osp.lookup_fld_wvl_focus(1)
+        df = trace.trace_field(self.opm, fld, wvl, foc)
+        self.check_frames(df, self.concat_field(fld, wvl))
+
+    def test_trace_all_fields(self):
+        fld, wvl, foc = self.osp.lookup_fld_wvl_focus(0)
+        fset = [self.concat_field(f, wvl)
+                for f in self.osp.field_of_view.fields]
+        df_ref = pd.concat(fset, keys=self.osp.field_of_view.index_labels,
+                           names=['field'])
+        self.check_frames(trace.trace_all_fields(self.opm), df_ref)
+
+    def test_as_array(self):
+        fset = trace.trace_all_fields(self.opm, as_dataframe=False)
+        num_flds = len(self.osp.field_of_view.fields)
+        num_rays = len(self.osp.pupil.pupil_rays)
+        num_ifcs = len(self.opm.seq_model.ifcs)
+        self.assertEqual(fset.shape, (num_flds, num_rays, num_ifcs, 10))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Tests for the list behavior of RayArray and its use for traced rays
+
+"""
+
+import contextlib
+import io
+import unittest
+from pathlib import Path
+
+import numpy as np
+import numpy.testing as npt
+
+import rayoptics as ro
+from rayoptics.gui.appcmds import open_model
+from rayoptics.raytr import RayArray, RaySeg
+from rayoptics.raytr import trace
+
+
+class RayArrayTestCase(unittest.TestCase):
+    def setUp(self):
+        self.ray = []
+        for i in range(4):
+            pt = np.array([0., float(i), 2.*i])
+            d = np.array([0., 0.1*i, np.sqrt(1. - 0.01*i*i)])
+            nrml = np.array([0., 0., 1.])
+            self.ray.append([pt, d, 10.*i, nrml])
+        self.ray_array = RayArray.from_ray(self.ray)
+
+    def check_seg(self, seg, ray_seg):
+        self.assertIsInstance(seg, RaySeg)
+        npt.assert_array_equal(seg.p, ray_seg[0])
+        npt.assert_array_equal(seg.d, ray_seg[1])
+        self.assertEqual(seg.dst, ray_seg[2])
+        npt.assert_array_equal(seg.nrml, ray_seg[3])
+
+    def test_len(self):
+        self.assertEqual(len(self.ray_array), len(self.ray))
+        self.assertEqual(len(RayArray.from_ray([])), 0)
+
+    def test_int_index(self):
+        for i in range(len(self.ray)):
+            self.check_seg(self.ray_array[i], self.ray[i])
+        self.check_seg(self.ray_array[np.int64(2)], self.ray[2])
+
+    def test_negative_index(self):
+        for i in range(1, len(self.ray)+1):
+            self.check_seg(self.ray_array[-i], self.ray[-i])
+
+    def test_index_out_of_range(self):
+        with self.assertRaises(IndexError):
+            self.ray_array[len(self.ray)]
+        with self.assertRaises(IndexError):
+            self.ray_array[-len(self.ray)-1]
+
+    def test_invalid_index(self):
+        for key in (None, 1.0, np.array([0, 1]), (0, 1)):
+            with self.assertRaises(TypeError):
+                self.ray_array[key]
+
+    def test_slice(self):
+        for slc in (slice(1, None), slice(None, -1), slice(None, None, 2)):
+            sub = self.ray_array[slc]
+            self.assertIsInstance(sub, RayArray)
+            ray_slc = self.ray[slc]
+            self.assertEqual(len(sub), len(ray_slc))
+            for seg, ray_seg in zip(sub, ray_slc):
+                self.check_seg(seg, ray_seg)
+
+    def test_iter(self):
+        segs = list(self.ray_array)
+        self.assertEqual(len(segs), len(self.ray))
+        for seg, ray_seg in zip(segs, self.ray):
+            self.check_seg(seg, ray_seg)
+
+
+class BoundaryRaysTestCase(unittest.TestCase):
+    def setUp(self):
+        root_pth = Path(ro.__file__).resolve().parent
+        self.opm = open_model(root_pth/'codev/tests/ag_dblgauss.seq')
+        self.sm = self.opm.seq_model
+        # overfill the pupil in y so that the +Y and -Y rays fail
+        self.fld = self.opm.optical_spec.field_of_view.fields[2]
+        self.fld.vuy = self.fld.vly = -1.0
+
+    def test_failed_rays(self):
+        wvl = self.sm.central_wavelength()
+        rim_rays = trace.trace_boundary_rays_at_field(self.opm, self.fld, wvl)
+        num_failed = 0
+        for ray_pkg in rim_rays:
+            self.assertIsInstance(ray_pkg.ray, RayArray)
+            if len(ray_pkg.ray) < len(self.sm.ifcs):
+                num_failed += 1
+        self.assertEqual(num_failed, 2)
+
+    def test_failed_rays_named_tuples(self):
+        wvl = self.sm.central_wavelength()
+        rim_rays = trace.trace_boundary_rays_at_field(self.opm, self.fld, wvl,
+                                                      use_named_tuples=True)
+        for ray_pkg in rim_rays:
+            self.assertIsInstance(ray_pkg.ray, list)
+            for seg in ray_pkg.ray:
+                self.assertIsInstance(seg, RaySeg)
+
+
+class ListRayTestCase(unittest.TestCase):
+    def setUp(self):
+        root_pth = Path(ro.__file__).resolve().parent
+        self.opm = open_model(root_pth/'codev/tests/ag_dblgauss.seq')
+        sm = self.opm.seq_model
+        fld = self.opm.optical_spec.field_of_view.fields[2]
+        self.ray, op, wvl = trace.trace_base(self.opm, [0., 0.5], fld,
+                                             sm.central_wavelength())
+        self.tfrms = sm.gbl_tfrms
+
+    def list_ray(self, *args, **kwargs):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            trace.list_ray(*args, **kwargs)
+        return out.getvalue().splitlines()
+
+    def test_global_coords(self):
+        lines = self.list_ray(self.ray, tfrms=self.tfrms, start=4)
+        self.assertEqual(len(lines), 1 + len(self.ray) - 4)
+        rot, trns = self.tfrms[4]
+        pt = rot.dot(self.ray[4].p) + trns
+        vals = [float(v) for v in lines[1].split(':')[1].split()]
+        self.assertTrue(lines[1].startswith('  4:'))
+        npt.assert_allclose(vals[:3], pt, atol=1e-5)
+
+    def test_negative_start(self):
+        num = len(self.ray)
+        for tfrms in (None, self.tfrms):
+            self.assertEqual(self.list_ray(self.ray, tfrms=tfrms, start=-3),
+                             self.list_ray(self.ray, tfrms=tfrms,
+                                           start=num-3))
+            self.assertEqual(len(self.list_ray(self.ray, tfrms=tfrms,
+                                               start=-num-2)), 1 + num)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
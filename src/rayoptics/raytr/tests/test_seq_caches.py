@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Tests that the cached path and index data follow model changes
+
+"""
+
+import unittest
+from pathlib import Path
+
+import numpy as np
+import numpy.testing as npt
+
+import rayoptics as ro
+from rayoptics.gui.appcmds import open_model
+from rayoptics.elem import surface
+from rayoptics.seq import gap
+from rayoptics.seq.medium import Air, Glass
+from rayoptics.raytr import trace
+from rayoptics.raytr import raytrace as rt
+
+
+class SeqCachesTestCase(unittest.TestCase):
+    """ Trace an axial ray before and after editing the model.
+
+        The ray traced with the cached path must change with the edit and
+        match a trace through a freshly generated path.
+    """
+    def setUp(self):
+        root_pth = Path(ro.__file__).resolve().parent
+        self.opm = open_model(root_pth/'codev/tests/ag_dblgauss.seq')
+        self.sm = self.opm.seq_model
+        self.osp = self.opm.optical_spec
+
+    def trace_ray(self):
+        fld = self.osp.field_of_view.fields[0]
+        wvl = self.sm.central_wavelength()
+        ray, op, wvl = trace.trace_base(self.opm, [0., 0.5], fld, wvl)
+
+        pt0, dir0 = trace._prepare_ray(self.opm, [0., 0.5], fld)
+        ray_ref, op_ref, wvl = rt.trace(self.sm, pt0, dir0, wvl)
+        self.assertEqual(len(ray), len(ray_ref))
+        for seg, seg_ref in zip(ray, ray_ref):
+            npt.assert_array_equal(seg.p, seg_ref[0])
+            npt.assert_array_equal(seg.d, seg_ref[1])
+        self.assertEqual(op, op_ref)
+        return ray
+
+    def assert_ray_changed(self, ray, ray_new):
+        if len(ray) == len(ray_new):
+            self.assertFalse(np.array_equal(ray.pts, ray_new.pts) and
+                             np.array_equal(ray.dirs, ray_new.dirs))
+
+    def test_thickness(self):
+        ray = self.trace_ray()
+        self.sm.gaps[1].thi += 1.
+        self.sm.update_model()
+        self.assert_ray_changed(ray, self.trace_ray())
+
+    def test_medium(self):
+        ray = self.trace_ray()
+        rndx = self.sm.get_rndx_array(self.sm.index_for_wavelength(
+            self.sm.central_wavelength()))
+        self.sm.gaps[1].medium = Glass(nd=1.8, vd=30.)
+        self.sm.update_model()
+        self.assert_ray_changed(ray, self.trace_ray())
+        rndx_new = self.sm.get_rndx_array(self.sm.index_for_wavelength(
+            self.sm.central_wavelength()))
+        self.assertNotEqual(rndx[1], rndx_new[1])
+        self.assertAlmostEqual(rndx_new[1], 1.8, places=3)
+
+    def test_insert_remove(self):
+        ray = self.trace_ray()
+        self.sm.cur_surface = 1
+        self.sm.insert(surface.Surface(), gap.Gap(5., Air()))
+        self.sm.update_model()
+        ray_ins = self.trace_ray()
+        self.assertEqual(len(ray_ins), len(ray) + 1)
+
+        self.sm.remove(2)
+        self.sm.update_model()
+        ray_rem = self.trace_ray()
+        self.assertEqual(len(ray_rem), len(ray))
+        npt.assert_allclose(ray_rem.pts, ray.pts, rtol=1e-12, atol=1e-12)
+
+    def test_flip(self):
+        ray = self.trace_ray()
+        self.sm.flip(1, 2)
+        self.assert_ray_changed(ray, self.trace_ray())
+
+    def test_wavelengths(self):
+        ray = self.trace_ray()
+        wvls = self.osp.spectral_region
+        rndx = self.sm.get_rndx_array(wvls.reference_wvl)
+        wvls.set_from_list([[480., 1.], [520., 1.], [540., 1.]])
+        wvls.reference_wvl = 1
+        self.sm.update_model()
+        self.assert_ray_changed(ray, self.trace_ray())
+        rndx_new = self.sm.get_rndx_array(wvls.reference_wvl)
+        self.assertFalse(np.array_equal(rndx, rndx_new))
+
+    def test_rndx_array_read_only(self):
+        rndx = self.sm.get_rndx_array(0)
+        self.assertFalse(rndx.flags.writeable)
+        with self.assertRaises(ValueError):
+            rndx[1] = 1.
+        self.assertIs(self.sm.get_rndx_array(0), rndx)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Tests that trace_base_batch matches trace_base ray by ray
+
+"""
+
+import unittest
+from pathlib import Path
+
+import numpy as np
+import numpy.testing as npt
+
+import rayoptics as ro
+from rayoptics.gui.appcmds import open_model
+from rayoptics.raytr import trace
+
+
+class TraceBaseBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        x, y = np.meshgrid(np.linspace(-1., 1., 5), np.linspace(-1., 1., 5))
+        pupils = np.column_stack((x.ravel(), y.ravel()))
+        self.pupils = pupils[np.sum(pupils**2, axis=1) <= 1.]
+
+    def open(self, filename):
+        root_pth = Path(ro.__file__).resolve().parent
+        return open_model(root_pth/filename)
+
+    def check_batch(self, opm, fld, apply_vignetting=True):
+        wvl = opm.seq_model.central_wavelength()
+        ray_pkgs = trace.trace_base_batch(opm, self.pupils, fld, wvl,
+                                          apply_vignetting=apply_vignetting)
+        self.assertEqual(len(ray_pkgs), len(self.pupils))
+        for pupil, ray_pkg in zip(self.pupils, ray_pkgs):
+            ray, op, wl = ray_pkg
+            ray_ref, op_ref, wl_ref = trace.trace_base(
+                opm, pupil, fld, wvl, apply_vignetting=apply_vignetting)
+            npt.assert_array_equal(ray.pts, ray_ref.pts)
+            npt.assert_array_equal(ray.dirs, ray_ref.dirs)
+            npt.assert_array_equal(ray.dsts, ray_ref.dsts)
+            npt.assert_array_equal(ray.nrmls, ray_ref.nrmls)
+            npt.assert_array_equal(op, op_ref)
+            self.assertEqual(wl, wl_ref)
+
+    def test_vignetted_fields(self):
+        opm = self.open('codev/tests/ag_dblgauss.seq')
+        for fld in opm.optical_spec.field_of_view.fields:
+            fld.vux, fld.vlx = 0.1, 0.05
+            fld.vuy, fld.vly = 0.2, 0.3
+            self.check_batch(opm, fld)
+            self.check_batch(opm, fld, apply_vignetting=False)
+
+    def test_virtual_object(self):
+        opm = self.open('optical/tests/singlet_f3.roa')
+        opm.seq_model.gaps[0].thi = -20.
+        opm.update_model()
+        for fld in opm.optical_spec.field_of_view.fields:
+            # the entrance pupil is on the -z side of the object, so the
+            #  starting directions are reversed
+            eprad, pupil_z, aim_pt, pt0, z_dir0 = \
+                trace._get_trace_base_consts(opm, fld)
+            self.assertTrue(pupil_z*z_dir0 < 0.)
+            fld.vuy, fld.vly = 0.2, 0.1
+            self.check_batch(opm, fld)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
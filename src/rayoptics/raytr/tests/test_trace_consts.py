@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Tests that the per-field ray setup data used by trace_base is refreshed
+
+"""
+
+import unittest
+from pathlib import Path
+
+import numpy as np
+import numpy.testing as npt
+
+import rayoptics as ro
+from rayoptics.gui.appcmds import open_model
+from rayoptics.raytr import trace
+
+
+class TraceBaseConstsTestCase(unittest.TestCase):
+    """ Edit the model or field and compare the cached setup data against
+        data computed with an empty cache.
+    """
+    def setUp(self):
+        root_pth = Path(ro.__file__).resolve().parent
+        self.opm = open_model(root_pth/'codev/tests/ag_dblgauss.seq')
+        self.osp = self.opm.optical_spec
+        self.fov = self.osp.field_of_view
+        self.fld = self.fov.fields[1]
+
+    def fresh_consts(self):
+        trace._trace_base_consts.pop(self.fld, None)
+        return trace._get_trace_base_consts(self.opm, self.fld)
+
+    def check_consts(self, consts, consts_ref):
+        self.assertEqual(len(consts), len(consts_ref))
+        for c, c_ref in zip(consts, consts_ref):
+            npt.assert_array_equal(c, c_ref)
+
+    def check_update(self, edit):
+        consts = trace._get_trace_base_consts(self.opm, self.fld)
+        edit()
+        consts_new = trace._get_trace_base_consts(self.opm, self.fld)
+        self.assertFalse(all(np.array_equal(c, c_new)
+                             for c, c_new in zip(consts, consts_new)))
+        self.check_consts(consts_new, self.fresh_consts())
+
+    def test_cache_hit(self):
+        consts = trace._get_trace_base_consts(self.opm, self.fld)
+        self.assertIs(trace._get_trace_base_consts(self.opm, self.fld),
+                      consts)
+
+    def test_field_coords(self):
+        def edit():
+            self.fld.y = 5.
+        self.check_update(edit)
+
+        def edit():
+            self.fld.x = 3.
+        self.check_update(edit)
+
+    def test_aim_pt(self):
+        def edit():
+            self.fld.aim_pt = np.array([0., 0.1])
+        self.check_update(edit)
+
+    def test_update_model(self):
+        def edit():
+            self.opm.seq_model.gaps[1].thi += 2.
+            self.opm.update_model()
+        self.check_update(edit)
+
+    def test_fov_relative(self):
+        def edit():
+            self.fov.is_relative = True
+            self.fov.value = 0.5
+        self.check_update(edit)
+
+        def edit():
+            self.fov.value = 0.25
+        self.check_update(edit)
+
+    def test_fov_key(self):
+        def edit():
+            self.fov.key = ('field', 'object', 'height')
+        self.check_update(edit)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
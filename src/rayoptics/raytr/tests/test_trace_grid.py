@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Tests that trace_grid matches the nested list construction it replaced
+
+"""
+
+import itertools
+import unittest
+from pathlib import Path
+
+import numpy as np
+import numpy.testing as npt
+
+import rayoptics as ro
+from rayoptics.gui.appcmds import open_model
+from rayoptics.raytr import trace
+
+
+def trace_grid_ref(opt_model, grid_rng, fld, wvl, foc, img_filter=None,
+                   form='grid', append_if_none=True, **kwargs):
+    """ the ray by ray, nested list version of trace_grid """
+    output_filter = kwargs.pop('output_filter', None)
+    rayerr_filter = kwargs.pop('rayerr_filter', None)
+    start = np.array(grid_rng[0])
+    stop = grid_rng[1]
+    num = grid_rng[2]
+    step = np.array((stop - start)/(num - 1))
+    grid = []
+    for i in range(num):
+        if form == 'list':
+            working_grid = grid
+        elif form == 'grid':
+            grid_row = []
+            working_grid = grid_row
+
+        for j in range(num):
+            pupil = np.array(start)
+            ray_result = trace.trace_safe(opt_model, pupil, fld, wvl,
+                                          output_filter, rayerr_filter,
+                                          check_apertures=True, **kwargs)
+            if ray_result is not None:
+                if img_filter:
+                    result = img_filter(pupil, ray_result)
+                    working_grid.append(result)
+                else:
+                    working_grid.append([pupil[0], pupil[1], ray_result])
+            else:  # ray outside pupil or failed
+                if img_filter:
+                    result = img_filter(pupil, None)
+                    if result is not None or append_if_none:
+                        working_grid.append(result)
+                else:
+                    if append_if_none:
+                        working_grid.append([pupil[0], pupil[1], None])
+
+            start[1] += step[1]
+        if form == 'grid':
+            grid.append(grid_row)
+        start[0] += step[0]
+        start[1] = grid_rng[0][1]
+    return np.array(grid)
+
+
+def image_pt(pupil, ray_result):
+    """ x, y on the image, or None for a failed ray """
+    if ray_result is None:
+        return None
+    ray, op, wvl = ray_result
+    seg = ray if isinstance(ray, tuple) else ray[-1]
+    return np.array([pupil[0], pupil[1], seg[0][0], seg[0][1]])
+
+
+def image_pt_nan(pupil, ray_result):
+    """ x, y on the image, or nans for a failed ray """
+    if ray_result is None:
+        return np.array([pupil[0], pupil[1], np.nan, np.nan])
+    return image_pt(pupil, ray_result)
+
+
+def image_pt_list(pupil, ray_result):
+    """ x, y on the image as a list, which isn't stacked directly """
+    return list(image_pt_nan(pupil, ray_result))
+
+
+class TraceGridTestCase(unittest.TestCase):
+    def setUp(self):
+        root_pth = Path(ro.__file__).resolve().parent
+        self.opm = open_model(root_pth/'codev/tests/ag_dblgauss.seq')
+        self.fld, self.wvl, self.foc = \
+            self.opm.optical_spec.lookup_fld_wvl_focus(2)
+
+    def run_grid(self, trace_grid_fct, grid_rng, **kwargs):
+        try:
+            return trace_grid_fct(self.opm, grid_rng, self.fld, self.wvl,
+                                  self.foc, **kwargs)
+        except Exception as exc:
+            return exc
+
+    def check_entry(self, entry, entry_ref):
+        if entry_ref is None:
+            self.assertIsNone(entry)
+        else:
+            npt.assert_allclose(entry, entry_ref, rtol=1e-12, atol=1e-14)
+
+    def check_grid(self, grid_rng, **kwargs):
+        msg = str(kwargs)
+        grid = self.run_grid(trace.trace_grid, grid_rng, **kwargs)
+        grid_ref = self.run_grid(trace_grid_ref, grid_rng, **kwargs)
+        if isinstance(grid_ref, Exception):
+            self.assertIs(type(grid), type(grid_ref), msg=msg)
+            return
+        self.assertIsInstance(grid, np.ndarray, msg=msg)
+        self.assertEqual(grid.shape, grid_ref.shape, msg=msg)
+        self.assertEqual(grid.dtype, grid_ref.dtype, msg=msg)
+        if grid_ref.dtype == object:
+            for entry, entry_ref in zip(grid.flat, grid_ref.flat):
+                self.check_entry(entry, entry_ref)
+        else:
+            npt.assert_allclose(grid, grid_ref, rtol=1e-12, atol=1e-14,
+                                err_msg=msg)
+
+    def test_img_filter(self):
+        # the grid overfills the pupil so that some rays fail
+        grid_rng = [np.array([-1.2, -1.2]), np.array([1.2, 1.2]), 7]
+        for img_filter, form, append_if_none, output_filter in \
+                itertools.product((image_pt, image_pt_nan, image_pt_list),
+                                  ('grid', 'list'),
+                                  (True, False), (None, 'last')):
+            self.check_grid(grid_rng, img_filter=img_filter, form=form,
+                            append_if_none=append_if_none,
+                            output_filter=output_filter)
+
+    def test_no_img_filter(self):
+        # all of the rays fail outside of the pupil, so the ray results
+        #  are all None and the [px, py, None] entries are uniform
+        grid_rng = [np.array([2., 2.]), np.array([3., 3.]), 4]
+        for form, append_if_none, output_filter in \
+                itertools.product(('grid', 'list'), (True, False),
+                                  (None, 'last')):
+            self.check_grid(grid_rng, form=form,
+                            append_if_none=append_if_none,
+                            output_filter=output_filter)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
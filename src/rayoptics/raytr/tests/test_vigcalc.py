@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Tests for the vignetting and clear aperture calculations
+
+"""
+
+import unittest
+from pathlib import Path
+
+import numpy.testing as npt
+
+import rayoptics as ro
+from rayoptics.gui.appcmds import open_model
+from rayoptics.raytr import vigcalc
+
+
+class VigCalcTestCase(unittest.TestCase):
+    def setUp(self):
+        root_pth = Path(ro.__file__).resolve().parent
+        self.opm = open_model(root_pth/'codev/tests/ag_dblgauss.seq')
+        self.osp = self.opm['osp']
+
+    def test_limiting_ifc(self):
+        # the upper y ray of field 1 is aimed onto the edge of ifcs[8] but
+        #  is limited by ifcs[9]
+        fld, wvl, foc = self.osp.lookup_fld_wvl_focus(1)
+        vig, last_indx, ray_pkg = vigcalc.calc_vignetted_ray(
+            self.opm, 1, [0., 1.], fld, wvl)
+        self.assertEqual(last_indx, 9)
+        self.assertAlmostEqual(vig, 0.2, places=5)
+
+    def test_set_vig(self):
+        vigcalc.set_vig(self.opm)
+        vig = [(f.vux, f.vlx, f.vuy, f.vly)
+               for f in self.osp['fov'].fields]
+        npt.assert_allclose(vig, [(-0.003619, -0.003619, -0.003619, -0.003619),
+                                  (-0.001895, -0.001895, 0.2, 0.234277),
+                                  (0., 0., 0.4, 0.392594)],
+                            rtol=0., atol=1e-5)
+
+    def test_set_ape(self):
+        vigcalc.set_vig(self.opm)
+        vigcalc.set_ape(self.opm)
+        max_ap = [ifc.max_aperture for ifc in self.opm['sm'].ifcs[1:-1]]
+        npt.assert_allclose(max_ap, [28.1719, 27.1359, 24.6262, 22.8939,
+                                     17.2926, 15.7576, 15.1348, 17.2501,
+                                     18.9261, 20.3490, 20.7763],
+                            rtol=0., atol=1e-3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+""" Tests for the pupil vignetting of a Field
+
+"""
+
+import unittest
+import numpy as np
+import numpy.testing as npt
+
+from rayoptics.raytr.opticalspec import Field
+
+
+class FieldVignettingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.fld = Field(y=1.)
+        self.fld.vlx, self.fld.vux = 0.1, 0.2
+        self.fld.vly, self.fld.vuy = 0.3, 0.
+        x, y = np.meshgrid(np.linspace(-1., 1., 5), np.linspace(-1., 1., 5))
+        self.pupils = np.column_stack((x.ravel(), y.ravel()))
+
+    def test_batch_matches_scalar(self):
+        vig_pupils = self.fld.apply_vignetting_batch(self.pupils)
+        for pupil, vig_pupil in zip(self.pupils, vig_pupils):
+            npt.assert_array_equal(vig_pupil,
+                                   self.fld.apply_vignetting(list(pupil)))
+
+    def test_batch_copies_input(self):
+        pupils = self.pupils.copy()
+        self.fld.apply_vignetting_batch(pupils)
+        npt.assert_array_equal(pupils, self.pupils)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -8,21 +8,26 @@
 .. codeauthor: Michael J. Hayford
 """
 
+from concurrent.futures import ProcessPoolExecutor
+import functools
 import itertools
-import logging
 import math
+import weakref
 import numpy as np
 from numpy.linalg import norm
-from scipy.optimize import newton, fsolve
 import pandas as pd
 
 from . import raytrace as rt
-from . import RayPkg, RaySeg
+from . import RayPkg, RaySeg, RayArray
 from .waveabr import (wave_abr_full_calc, calculate_reference_sphere, 
                       transfer_to_exit_pupil)
 from rayoptics.optical import model_constants as mc
 from .traceerror import TraceError, TraceMissedSurfaceError, TraceTIRError
 
+# per field cache of the ray setup data used by trace_base, see
+#  _get_trace_base_consts()
+_trace_base_consts = weakref.WeakKeyDictionary()
+
 
 def ray_pkg(ray_pkg):
     """ return a |Series| containing a ray package (RayPkg) """
@@ -31,12 +36,39 @@ def ray_pkg(ray_pkg):
 
 def ray_df(ray):
     """ return a |DataFrame| containing ray data """
-    r = pd.DataFrame(ray, columns=['inc_pt', 'after_dir',
+    r = pd.DataFrame(list(ray), columns=['inc_pt', 'after_dir',
                                    'after_dst', 'normal'])
     r.index.names = ['intrfc']
     return r
 
 
+def ray_df_from_array(ray_arr, keys=(), names=()):
+    """ return a |DataFrame| for an array of ray data
+
+    The frame has the same columns as the one returned by :func:`~.ray_df`.
+
+    Args:
+        ray_arr: ray data, shape (..., num_intrfcs, 10), where the last axis
+                 is [px, py, pz, dx, dy, dz, dst, nx, ny, nz]
+        keys: a sequence of labels for each of the leading axes of ray_arr
+        names: the index level names for the leading axes of ray_arr
+
+    Returns:
+        a |DataFrame| indexed by the **keys** and by 'intrfc'
+    """
+    ray_arr = np.asarray(ray_arr)
+    rows = ray_arr.reshape(-1, 10)
+    data = {'inc_pt': list(rows[:, 0:3]), 'after_dir': list(rows[:, 3:6]),
+            'after_dst': rows[:, 6], 'normal': list(rows[:, 7:10])}
+    intrfcs = range(ray_arr.shape[-2])
+    if len(keys) == 0:
+        index = pd.RangeIndex(len(intrfcs), name='intrfc')
+    else:
+        index = pd.MultiIndex.from_product([*keys, intrfcs],
+                                           names=[*names, 'intrfc'])
+    return pd.DataFrame(data, index=index)
+
+
 def list_ray(ray_obj, tfrms=None, start=0):
     """ pretty print a ray either in local or global coordinates """
     if isinstance(ray_obj, tuple):
@@ -51,18 +83,20 @@ def list_ray(ray_obj, tfrms=None, start=0):
     colFormats = "{:3d}: {:12.5f} {:12.5f} {:12.5g} {:12.6f} {:12.6f} " \
                  "{:12.6f} {:12.5g}"
 
-    for i, r in enumerate(ray[start:], start=start):
-        if tfrms is None:
-            print(colFormats.format(i,
-                                    r[mc.p][0], r[mc.p][1], r[mc.p][2],
-                                    r[mc.d][0], r[mc.d][1], r[mc.d][2],
-                                    r[mc.dst]))
-        else:
-            rot, trns = tfrms[i]
-            p = rot.dot(r[mc.p]) + trns
-            d = rot.dot(r[mc.d])
-            print(colFormats.format(i, p[0], p[1], p[2], d[0], d[1], d[2],
-                                    r[mc.dst]))
+    ray = RayArray.from_ray(ray)
+    # a negative start counts back from the end of the ray, as for slicing
+    start = slice(start, None).indices(len(ray))[0]
+    ray = ray[start:]
+    pts, dirs = ray.pts, ray.dirs
+    if tfrms is not None:
+        # transform all of the segments at once
+        tfrms = tfrms[start:start+len(ray)]
+        rots = np.array([rot for rot, trns in tfrms])
+        trnss = np.array([trns for rot, trns in tfrms])
+        pts = np.einsum('nij,nj->ni', rots, pts) + trnss
+        dirs = np.einsum('nij,nj->ni', rots, dirs)
+    for i, (p, d, dst) in enumerate(zip(pts, dirs, ray.dsts), start=start):
+        print(colFormats.format(i, p[0], p[1], p[2], d[0], d[1], d[2], dst))
 
 
 def trace_safe(opt_model, pupil, fld, wvl,
@@ -91,53 +125,128 @@ def trace_safe(opt_model, pupil, fld, wvl,
         ray_result: see discussion of filters, above.
 
     """
-    use_named_tuples = kwargs.get('use_named_tuples', False)
+    apply_vignetting = kwargs.pop('apply_vignetting', True)
+    pt0, dir0 = _prepare_ray(opt_model, pupil, fld,
+                             apply_vignetting=apply_vignetting)
+    return _trace_safe_start(opt_model.seq_model, pt0, dir0, wvl,
+                             output_filter, rayerr_filter, **kwargs)
+
+
+def _trace_safe_start(seq_model, pt0, dir0, wvl,
+                      output_filter, rayerr_filter, **kwargs):
+    """Trace the ray starting at pt0, dir0 and filter the result.
+
+    See :func:`~.trace_safe` for a description of the filter arguments.
+    """
+    output_fct, rayerr_fct = _trace_safe_filters(output_filter, rayerr_filter)
+    return _trace_filtered(seq_model, pt0, dir0, wvl,
+                           output_fct, rayerr_fct, **kwargs)
 
-    ray_result = None
 
+def _trace_filtered(seq_model, pt0, dir0, wvl, output_fct, rayerr_fct,
+                    **kwargs):
+    """Trace the ray starting at pt0, dir0 and apply the filter functions.
+
+    The filter functions are those returned by :func:`~._trace_safe_filters`.
+    """
     try:
-        ray_pkg = trace_base(opt_model, pupil, fld, wvl,
-                                   **kwargs)
+        ray, op_delta, wvl = rt.trace(seq_model, pt0, dir0, wvl,
+                                      path=seq_model.cached_path(wvl),
+                                      **kwargs)
     except TraceError as rayerr:
-        if rayerr_filter is None:
-            pass
-        elif rayerr_filter == 'full':
-            ray, op_delta, wvl = rayerr.ray_pkg
-            ray = [RaySeg(*rs) for rs in ray]
-            rayerr.ray_pkg = RayPkg(ray, op_delta, wvl)
-            ray_result = rayerr
-        elif rayerr_filter == 'summary':
-            rayerr.ray_pkg = None
-            ray_result = rayerr
-        else:
-            pass
+        return rayerr_fct(rayerr)
     else:
-        if use_named_tuples:
-            ray, op_delta, wvl = ray_pkg
+        if kwargs.get('use_named_tuples', False):
             ray = [RaySeg(*rs) for rs in ray]
-            ray_pkg = RayPkg(ray, op_delta, wvl)
-
-        if output_filter is None:
-            ray_result = ray_pkg
-        elif output_filter == 'last':
-            ray, op_delta, wvl = ray_pkg
-            final_seg_pkg = (ray[-1], op_delta, wvl)
-            ray_result = final_seg_pkg
         else:
-            ray_result = output_filter(ray_pkg)
+            ray = RayArray.from_ray(ray)
+        return output_fct(RayPkg(ray, op_delta, wvl))
+
+
+def _output_full(ray_pkg):
+    return ray_pkg
+
+
+def _output_last(ray_pkg):
+    ray, op_delta, wvl = ray_pkg
+    return ray[-1], op_delta, wvl
+
+
+def _rayerr_none(rayerr):
+    return None
+
+
+def _rayerr_summary(rayerr):
+    rayerr.ray_pkg = None
+    return rayerr
+
+
+def _rayerr_full(rayerr):
+    ray, op_delta, wvl = rayerr.ray_pkg
+    ray = [RaySeg(*rs) for rs in ray]
+    rayerr.ray_pkg = RayPkg(ray, op_delta, wvl)
+    return rayerr
+
+
+_output_filters = {None: _output_full, 'last': _output_last}
+_rayerr_filters = {'summary': _rayerr_summary, 'full': _rayerr_full}
+
+
+def _trace_safe_filters(output_filter, rayerr_filter):
+    """Return the functions implementing the trace_safe filter arguments.
+
+    Resolving the filters once lets a caller tracing many rays skip the
+    filter tests for each ray.
+
+    Returns:
+        (**output_fct**, **rayerr_fct**) applied to the RayPkg of a
+        successful trace and the TraceError of a failed one, respectively
+    """
+    if isinstance(output_filter, str) or output_filter is None:
+        output_fct = _output_filters[output_filter]
+    else:
+        output_fct = output_filter
+    if isinstance(rayerr_filter, str):
+        rayerr_fct = _rayerr_filters.get(rayerr_filter, _rayerr_none)
+    else:
+        rayerr_fct = _rayerr_none
+    return output_fct, rayerr_fct
+
+
+def _trace_safe_parallel(seq_model, pt0, dir0, wvl,
+                         output_filter, rayerr_filter, n_workers, **kwargs):
+    """Trace rays from pt0 along each of the directions in dir0 in parallel.
+
+    The rays are distributed over a pool of **n_workers** processes. The
+    model, filters and keyword arguments are pickled and sent to the worker
+    processes, so the filters must be picklable, i.e. not lambdas.
 
-    return ray_result
+    Returns:
+        a list of the ray_results, in the order of **dir0**
+    """
+    output_fct, rayerr_fct = _trace_safe_filters(output_filter, rayerr_filter)
+    trace_fct = functools.partial(_trace_filtered, seq_model, pt0, wvl=wvl,
+                                  output_fct=output_fct,
+                                  rayerr_fct=rayerr_fct, **kwargs)
+    chunksize = max(1, len(dir0)//(4*n_workers))
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(trace_fct, dir0, chunksize=chunksize))
 
 
 def retrieve_ray(ray_result):
-    """ Retrieve the ray (the list of ray segs) from ray_result.
+    """ Retrieve the ray package from ray_result.
     
     This function handles the normal case where the ray traces successfully
-    and the case of a ray failure, which returns a TraceError instance.
+    and the case of a ray failure, which returns a TraceError instance. The
+    ray of a failed trace is returned as a :class:`~.RayArray`, like that of
+    a successful one; None is returned if the TraceError has no ray_pkg.
     """
     px, py, ray_item = ray_result
     if isinstance(ray_item, TraceError):
-        return ray_item.ray_pkg
+        if ray_item.ray_pkg is None:
+            return None
+        ray, op_delta, wvl = ray_item.ray_pkg
+        return RayPkg(RayArray.from_ray(ray), op_delta, wvl)
     else:
         return ray_item
 
@@ -184,8 +293,8 @@ def trace_base(opt_model, pupil, fld, wvl, apply_vignetting=True, **kwargs):
     Returns:
         (**ray**, **op_delta**, **wvl**)
 
-        - **ray** is a list for each interface in **path_pkg** of these
-          elements: [pt, after_dir, after_dst, normal]
+        - **ray** is a :class:`~.RayArray` with an entry for each interface
+          in **path_pkg** of these elements: [pt, after_dir, after_dst, normal]
 
             - pt: the intersection point of the ray
             - after_dir: the ray direction cosine following the interface
@@ -197,25 +306,142 @@ def trace_base(opt_model, pupil, fld, wvl, apply_vignetting=True, **kwargs):
           optical axis
         - **wvl** - wavelength (in nm) that the ray was traced in
     """
+    pt0, dir0 = _prepare_ray(opt_model, pupil, fld,
+                             apply_vignetting=apply_vignetting)
+    seq_model = opt_model.seq_model
+    ray, op_delta, wvl = rt.trace(seq_model, pt0, dir0, wvl,
+                                  path=seq_model.cached_path(wvl), **kwargs)
+    return RayArray.from_ray(ray), op_delta, wvl
+
+
+def trace_base_batch(opt_model, pupils, fld, wvl, apply_vignetting=True,
+                     **kwargs):
+    """Trace the rays specified by an array of pupil coordinates at **fld**.
+
+    This is equivalent to calling :func:`~.trace_base` for each of the
+    **pupils**, but the ray setup and the sequential path are computed once
+    for the whole batch.
+
+    Args:
+        opt_model: instance of :class:`~.OpticalModel` to trace
+        pupils: relative pupil coordinates of the rays, shape (N, 2)
+        fld: instance of :class:`~.Field`
+        wvl: ray trace wavelength in nm
+        **kwargs: keyword arguments
+
+    Returns:
+        a list of N :class:`~.RayPkg`, one for each of the **pupils**
+
+    Raises:
+        TraceError: if any of the rays fails to trace
+    """
+    seq_model = opt_model.seq_model
+    _, pt0, dir0 = _prepare_ray_batch(opt_model, pupils, fld,
+                                      apply_vignetting=apply_vignetting)
+    path = seq_model.cached_path(wvl)
+    ray_pkgs = []
+    for d in dir0:
+        ray, op_delta, wl = rt.trace(seq_model, pt0, d, wvl, path=path,
+                                     **kwargs)
+        ray_pkgs.append(RayPkg(RayArray.from_ray(ray), op_delta, wl))
+    return ray_pkgs
+
+
+def _prepare_ray(opt_model, pupil, fld, apply_vignetting=True):
+    """Return the starting point and direction cosines of a ray at **pupil**.
+
+    Args:
+        opt_model: instance of :class:`~.OpticalModel` to trace
+        pupil: relative pupil coordinates of ray
+        fld: instance of :class:`~.Field`
+        apply_vignetting: if True, apply the vignetting factors of **fld**
+
+    Returns:
+        (**pt0**, **dir0**) on the object interface
+    """
     vig_pupil = fld.apply_vignetting(pupil) if apply_vignetting else pupil
-    osp = opt_model.optical_spec
-    fod = opt_model['analysis_results']['parax_data'].fod
-    eprad = fod.enp_radius
-    aim_pt = np.array([0., 0.])
-    if hasattr(fld, 'aim_pt') and fld.aim_pt is not None:
-        aim_pt = fld.aim_pt
+    eprad, pupil_z, aim_pt, pt0, z_dir0 = _get_trace_base_consts(opt_model,
+                                                                 fld)
     pt1 = np.array([eprad*vig_pupil[0]+aim_pt[0], eprad*vig_pupil[1]+aim_pt[1],
-                    fod.obj_dist+fod.enp_dist])
-    pt0 = osp.obj_coords(fld)
+                    pupil_z])
     dir0 = pt1 - pt0
-    length = norm(dir0)
-    dir0 = dir0/length
-    sm = opt_model.seq_model
+    dir0 /= math.sqrt(dir0.dot(dir0))
     # To handle virtual object distances, always propagate from 
     #  the object in a positive Z direction.
-    if dir0[2] * sm.z_dir[0] < 0:
+    if dir0[2] * z_dir0 < 0:
         dir0 = -dir0
-    return rt.trace(sm, pt0, dir0, wvl, **kwargs)
+    return pt0, dir0
+
+
+def _prepare_ray_batch(opt_model, pupils, fld, apply_vignetting=True):
+    """Vectorized version of :func:`~._prepare_ray` for an array of pupils.
+
+    Args:
+        opt_model: instance of :class:`~.OpticalModel` to trace
+        pupils: array of relative pupil coordinates, shape (N, 2)
+        fld: instance of :class:`~.Field`
+        apply_vignetting: if True, apply the vignetting factors of **fld**
+
+    Returns:
+        (**vig_pupils**, **pt0**, **dir0**)
+
+        - **vig_pupils** - the (vignetted) pupil coordinates, shape (N, 2)
+        - **pt0** - the starting point on the object interface
+        - **dir0** - the starting direction cosines, shape (N, 3)
+    """
+    if apply_vignetting:
+        vig_pupils = fld.apply_vignetting_batch(pupils)
+    else:
+        vig_pupils = np.array(pupils, dtype=float)
+    eprad, pupil_z, aim_pt, pt0, z_dir0 = _get_trace_base_consts(opt_model,
+                                                                 fld)
+    pt1 = np.empty((len(vig_pupils), 3))
+    pt1[:, 0] = eprad*vig_pupils[:, 0] + aim_pt[0]
+    pt1[:, 1] = eprad*vig_pupils[:, 1] + aim_pt[1]
+    pt1[:, 2] = pupil_z
+    dir0 = pt1 - pt0
+    dir0 /= norm(dir0, axis=1)[:, np.newaxis]
+    # reverse the rays that start in the wrong direction, see _prepare_ray
+    dir0[dir0[:, 2] * z_dir0 < 0] *= -1
+    return vig_pupils, pt0, dir0
+
+
+def _get_trace_base_consts(opt_model, fld):
+    """Return the ray setup data that doesn't depend on the pupil coordinates.
+
+    The data is cached for each **fld**. It is recomputed when the paraxial
+    data of **opt_model** is updated, when the coordinates or aim point of
+    **fld** change, or when the field of view's value, is_relative or key
+    change.
+
+    Returns:
+        (**eprad**, **pupil_z**, **aim_pt**, **pt0**, **z_dir0**)
+
+        - **eprad** - the entrance pupil radius
+        - **pupil_z** - z coordinate of the entrance pupil, wrt the object
+        - **aim_pt** - x, y aim point on the entrance pupil
+        - **pt0** - starting point of the rays on the object interface
+        - **z_dir0** - z direction of the object space gap
+    """
+    parax_data = opt_model['analysis_results']['parax_data']
+    fov = opt_model.optical_spec.field_of_view
+    fld_aim_pt = getattr(fld, 'aim_pt', None)
+    z_dir0 = opt_model.seq_model.z_dir[0]
+    # the values read by obj_coords(), in addition to parax_data
+    key = (fld.x, fld.y, fov.value, fov.is_relative, tuple(fov.key), z_dir0)
+    cached = _trace_base_consts.get(fld)
+    if (cached is not None and cached[0] is parax_data and
+            cached[1] is fov and cached[2] is fld_aim_pt and
+            cached[3] == key):
+        return cached[4]
+
+    fod = parax_data.fod
+    aim_pt = np.array([0., 0.]) if fld_aim_pt is None else fld_aim_pt
+    pt0 = fov.obj_coords(fld)
+    consts = (fod.enp_radius, fod.obj_dist+fod.enp_dist, aim_pt, pt0,
+              z_dir0)
+    _trace_base_consts[fld] = (parax_data, fov, fld_aim_pt, key, consts)
+    return consts
 
 
 def iterate_ray(opt_model, ifcx, xy_target, fld, wvl, **kwargs):
@@ -226,14 +452,20 @@ def iterate_ray(opt_model, ifcx, xy_target, fld, wvl, **kwargs):
 
     If the iteration fails, a TraceError will be raised
     """
+    # the rays traced by the residual functions are discarded after each
+    #  evaluation, so the pupil point and direction buffers can be reused
+    pt1 = np.empty(3)
+    dir0 = np.empty(3)
+
     def y_stop_coordinate(y1, *args):
         seq_model, ifcx, pt0, dist, wvl, y_target = args
-        pt1 = np.array([0., y1, dist])
-        dir0 = pt1 - pt0
-        length = norm(dir0)
-        dir0 = dir0/length
+        pt1[0] = 0.
+        pt1[1] = y1
+        pt1[2] = dist
+        np.subtract(pt1, pt0, out=dir0)
+        np.divide(dir0, math.sqrt(dir0.dot(dir0)), out=dir0)
         try:
-            ray, _, _ = rt.trace(seq_model, pt0, dir0, wvl)
+            ray, _, _ = rt.trace(seq_model, pt0, dir0, wvl, path=path)
         except TraceMissedSurfaceError as ray_miss:
             ray = ray_miss.ray_pkg
             if ray_miss.surf <= ifcx:
@@ -248,47 +480,45 @@ def iterate_ray(opt_model, ifcx, xy_target, fld, wvl, **kwargs):
 
     def surface_coordinate(coord, *args):
         seq_model, ifcx, pt0, dist, wvl, target = args
-        pt1 = np.array([coord[0], coord[1], dist])
-        dir0 = pt1 - pt0
-        length = norm(dir0)
-        dir0 = dir0/length
-        ray, _, _ = rt.trace(seq_model, pt0, dir0, wvl)
+        pt1[0] = coord[0]
+        pt1[1] = coord[1]
+        pt1[2] = dist
+        np.subtract(pt1, pt0, out=dir0)
+        np.divide(dir0, math.sqrt(dir0.dot(dir0)), out=dir0)
+        ray, _, _ = rt.trace(seq_model, pt0, dir0, wvl, path=path)
         xy_ray = np.array([ray[ifcx][mc.p][0], ray[ifcx][mc.p][1]])
 #        print(coord[0], coord[1], xy_ray[0], xy_ray[1])
         return xy_ray - target
 
     seq_model = opt_model.seq_model
     osp = opt_model.optical_spec
+    path = seq_model.cached_path(wvl)
 
     fod = opt_model['analysis_results']['parax_data'].fod
     dist = fod.obj_dist + fod.enp_dist
 
     pt0 = osp.obj_coords(fld)
+    # increment for the initial derivative estimates, proportional to the
+    #  pupil radius
+    h = max(1e-6, 0.0001*fod.enp_radius)
     if ifcx is not None:
         if pt0[0] == 0.0 and xy_target[0] == 0.0:
             # do 1D iteration if field and target points are zero in x
             y_target = xy_target[1]
-            logging.captureWarnings(True)
             try:
-                start_y, results = newton(y_stop_coordinate, 0.,
-                                          args=(seq_model, ifcx, pt0,
-                                                dist, wvl, y_target),
-                                          disp=False, full_output=True)
-            except RuntimeError as rte:
-                # if we come here, start_y is a RuntimeResults object
-                # print(rte)
-                start_y = results.root
+                start_y = _newton_1d(y_stop_coordinate, 0., h,
+                                     args=(seq_model, ifcx, pt0,
+                                           dist, wvl, y_target))
             except TraceError:
                 start_y = 0.0
             start_coords = np.array([0., start_y])
         else:
-            # do 2D iteration. epsfcn is a parameter increment,
-            #  make proportional to pupil radius
+            # do 2D iteration
             try:
-                start_coords = fsolve(surface_coordinate, np.array([0., 0.]),
-                                      epsfcn=0.0001*fod.enp_radius,
-                                      args=(seq_model, ifcx, pt0, dist,
-                                            wvl, xy_target))
+                start_coords = _broyden_2d(surface_coordinate,
+                                           np.array([0., 0.]), h,
+                                           args=(seq_model, ifcx, pt0, dist,
+                                                 wvl, xy_target))
             except TraceError:
                 start_coords = np.array([0., 0.])
     else:  # floating stop surface - use entrance pupil for aiming
@@ -297,6 +527,70 @@ def iterate_ray(opt_model, ifcx, xy_target, fld, wvl, **kwargs):
     return start_coords
 
 
+def _newton_1d(fct, x0, h, args=(), tol=1e-9, maxiter=50):
+    """ find a root of fct near x0 using Newton's method with secant slopes
+
+    The first slope is a forward difference with increment **h**. After that
+    the two most recent evaluations of **fct** give the slope, so that each
+    iteration traces a single ray. The iteration stops if a step doesn't
+    change the value of **fct**, returning the estimate before the step. If
+    the iteration doesn't converge in **maxiter** steps, the last estimate is
+    returned.
+    """
+    x_prev, f_prev = x0, fct(x0, *args)
+    if f_prev == 0.0:
+        return x0
+    x = x0 + h
+    for i in range(maxiter):
+        f = fct(x, *args)
+        if f == f_prev:
+            # the step gave no slope information; x_prev is at least as good
+            #  an estimate as x and, on the first step, isn't offset by h
+            return x_prev
+        dx = -f*(x - x_prev)/(f - f_prev)
+        x_prev, f_prev = x, f
+        x += dx
+        if abs(dx) < tol:
+            break
+    return x
+
+
+def _broyden_2d(fct, x0, h, args=(), tol=1e-9, maxiter=50):
+    """ find a root of the 2d function fct near x0 using Broyden's method
+
+    The jacobian is estimated once by forward differences with increment
+    **h** and then refined with Broyden's rank one update, so that each
+    iteration traces a single ray. The iteration stops if a step doesn't
+    change the value of **fct**. If the iteration doesn't converge in
+    **maxiter** steps, the last estimate is returned.
+    """
+    x = np.array(x0, dtype=float)
+    f = fct(x, *args)
+    jac = np.empty((2, 2))
+    for k in range(2):
+        x_h = np.array(x)
+        x_h[k] += h
+        jac[:, k] = (fct(x_h, *args) - f)/h
+    for i in range(maxiter):
+        try:
+            dx = -np.linalg.solve(jac, f)
+        except np.linalg.LinAlgError:
+            break
+        x = x + dx
+        if math.sqrt(dx[0]*dx[0] + dx[1]*dx[1]) < tol:
+            break
+        f_new = fct(x, *args)
+        df = f_new - f
+        if not df.any():
+            # the step gives no slope information, e.g. from a ray trace
+            #  from infinity, where tiny changes in aim are lost in the
+            #  direction cosines
+            break
+        jac += np.outer(df - jac.dot(dx), dx)/dx.dot(dx)
+        f = f_new
+    return x
+
+
 def trace_with_opd(opt_model, pupil, fld, wvl, foc, **kwargs):
     """ returns (ray, ray_opl, wvl, opd) """
     chief_ray_pkg = get_chief_ray_pkg(opt_model, fld, wvl, foc)
@@ -321,6 +615,10 @@ def trace_with_opd(opt_model, pupil, fld, wvl, foc, **kwargs):
 
 def trace_boundary_rays_at_field(opt_model, fld, wvl, use_named_tuples=False):
     """ returns a list of RayPkgs for the boundary rays for field fld
+
+    The ray of each RayPkg is a :class:`~.RayArray`, or a list of RaySegs if
+    **use_named_tuples** is True. Rays that fail to trace are returned up to
+    the point of failure.
     """
     rim_rays = []
     osp = opt_model.optical_spec
@@ -329,6 +627,7 @@ def trace_boundary_rays_at_field(opt_model, fld, wvl, use_named_tuples=False):
             ray, op, wvl = trace_base(opt_model, p, fld, wvl)
         except TraceError as ray_error:
             ray, op, wvl = ray_error.ray_pkg
+            ray = RayArray.from_ray(ray)
 
         if use_named_tuples:
             ray = [RaySeg(*rs) for rs in ray]
@@ -344,48 +643,82 @@ def boundary_ray_dict(opt_model, rim_rays):
 
 
 def trace_boundary_rays(opt_model, **kwargs):
+    """ trace the boundary rays for all fields, saving them on each field
+
+    If the keyword argument n_workers is given, the fields are traced in
+    parallel using a pool of n_workers processes.
+    """
+    n_workers = kwargs.pop('n_workers', None)
     rayset = []
     wvl = opt_model.seq_model.central_wavelength()
     fov = opt_model.optical_spec.field_of_view
-    for fi, fld in enumerate(fov.fields):
-        rim_rays = trace_boundary_rays_at_field(opt_model, fld, wvl, **kwargs)
+    if n_workers is None:
+        rim_rayset = [trace_boundary_rays_at_field(opt_model, fld, wvl,
+                                                   **kwargs)
+                      for fld in fov.fields]
+    else:
+        trace_fct = functools.partial(trace_boundary_rays_at_field,
+                                      opt_model, wvl=wvl, **kwargs)
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            rim_rayset = list(executor.map(trace_fct, fov.fields))
+
+    for fld, rim_rays in zip(fov.fields, rim_rayset):
         fld.pupil_rays = boundary_ray_dict(opt_model, rim_rays)
         rayset.append(rim_rays)
     return rayset
 
 
 def trace_ray_list_at_field(opt_model, ray_list, fld, wvl, foc):
-    """ returns a list of ray |DataFrame| for the ray_list at field fld """
-    rayset = []
-    for p in ray_list:
-        ray, op, wvl = trace_base(opt_model, p, fld, wvl)
-        rayset.append(ray)
-    rdf_list = [ray_df(r) for r in rayset]
-    return rdf_list
+    """ returns an array of ray data for the ray_list at field fld
+
+    The array has shape (num_rays, num_intrfcs, 10); the last axis is
+    [px, py, pz, dx, dy, dz, dst, nx, ny, nz]. Use
+    :func:`~.ray_df_from_array` to get a |DataFrame|.
+    """
+    rayset = trace_base_batch(opt_model, np.array(ray_list), fld, wvl)
+    return np.array([np.column_stack((r.pts, r.dirs, r.dsts, r.nrmls))
+                     for r, op, wl in rayset])
 
 
-def trace_field(opt_model, fld, wvl, foc):
-    """ returns a |DataFrame| with the boundary rays for field fld """
+def trace_field(opt_model, fld, wvl, foc, as_dataframe=True):
+    """ returns a |DataFrame| with the boundary rays for field fld
+
+    If **as_dataframe** is False, the ray data array from
+    :func:`~.trace_ray_list_at_field` is returned instead.
+    """
     osp = opt_model.optical_spec
     pupil_rays = osp.pupil.pupil_rays
-    rdf_list = trace_ray_list_at_field(opt_model, pupil_rays, fld, wvl, foc)
-    rset = pd.concat(rdf_list, keys=osp.pupil.ray_labels,
-                     names=['pupil'])
+    rset = trace_ray_list_at_field(opt_model, pupil_rays, fld, wvl, foc)
+    if as_dataframe:
+        rset = ray_df_from_array(rset, keys=[osp.pupil.ray_labels],
+                                 names=['pupil'])
     return rset
 
 
-def trace_all_fields(opt_model):
-    """ returns a |DataFrame| with the boundary rays for all fields """
+def trace_all_fields(opt_model, as_dataframe=True, n_workers=None):
+    """ returns a |DataFrame| with the boundary rays for all fields
+
+    If **as_dataframe** is False, an array of ray data with shape
+    (num_fields, num_rays, num_intrfcs, 10) is returned instead. If
+    **n_workers** is given, the fields are traced in parallel using a pool
+    of n_workers processes.
+    """
     osp = opt_model.optical_spec
     fld, wvl, foc = osp.lookup_fld_wvl_focus(0)
-    fset = []
-    for f in osp.field_of_view.fields:
-        rset = trace_field(opt_model, f, wvl, foc)
-        fset.append(rset)
-
-    fdf = pd.concat(fset, keys=osp.field_of_view.index_labels,
-                    names=['field'])
-    return fdf
+    if n_workers is None:
+        fset = [trace_field(opt_model, f, wvl, foc, as_dataframe=False)
+                for f in osp.field_of_view.fields]
+    else:
+        trace_fct = functools.partial(trace_field, opt_model, wvl=wvl,
+                                      foc=foc, as_dataframe=False)
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            fset = list(executor.map(trace_fct, osp.field_of_view.fields))
+    fset = np.array(fset)
+    if as_dataframe:
+        fset = ray_df_from_array(fset, keys=[osp.field_of_view.index_labels,
+                                             osp.pupil.ray_labels],
+                                 names=['field', 'pupil'])
+    return fset
 
 
 def trace_chief_ray(opt_model, fld, wvl, foc):
@@ -406,13 +739,13 @@ def trace_chief_ray(opt_model, fld, wvl, foc):
 
 def trace_fan(opt_model, fan_rng, fld, wvl, foc, img_filter=None,
               **kwargs):
-    start = np.array(fan_rng[0])
-    stop = fan_rng[1]
+    start = np.asarray(fan_rng[0], dtype=float)
+    stop = np.asarray(fan_rng[1], dtype=float)
     num = fan_rng[2]
-    step = (stop - start)/(num - 1)
+    pupils = np.linspace(start, stop, num)
     fan = []
     for r in range(num):
-        pupil = np.array(start)
+        pupil = pupils[r]
         ray, op, wvl = trace_base(opt_model, pupil, fld, wvl, **kwargs)
         # opl = rt.calc_optical_path(ray, opt_model.seq_model.path())
         ray_pkg = ray, op, wvl
@@ -422,19 +755,73 @@ def trace_fan(opt_model, fan_rng, fld, wvl, foc, img_filter=None,
             fan.append([pupil, result])
         else:
             fan.append([pupil, ray_pkg])
-
-        start += step
     return fan
 
 
 def trace_grid(opt_model, grid_rng, fld, wvl, foc, img_filter=None,
                form='grid', append_if_none=True, **kwargs):
-    output_filter = kwargs.get('output_filter', None)
-    rayerr_filter = kwargs.get('rayerr_filter', None)
+    """ trace a square grid of rays over the range grid_rng at fld and wvl
+
+    The keyword arguments output_filter and rayerr_filter are handled as in
+    :func:`~.trace_safe`. If the keyword argument n_workers is given, the
+    grid is traced in parallel using a pool of n_workers processes. This
+    requires the filters to be picklable; img_filter is applied in the
+    calling process and may be anything. The cost of sending the model to
+    the workers makes this worthwhile only for large grids.
+    """
+    output_filter = kwargs.pop('output_filter', None)
+    rayerr_filter = kwargs.pop('rayerr_filter', None)
+    apply_vignetting = kwargs.pop('apply_vignetting', True)
+    n_workers = kwargs.pop('n_workers', None)
     start = np.array(grid_rng[0])
     stop = grid_rng[1]
     num = grid_rng[2]
     step = np.array((stop - start)/(num - 1))
+
+    # set up the starting rays for the entire grid at once
+    rng = np.arange(num)
+    pupils = np.empty((num, num, 2))
+    pupils[:, :, 0] = (start[0] + rng*step[0])[:, np.newaxis]
+    pupils[:, :, 1] = (start[1] + rng*step[1])[np.newaxis, :]
+    pupils, pt0, dir0 = _prepare_ray_batch(opt_model, pupils.reshape(-1, 2),
+                                           fld, apply_vignetting)
+    pupils = pupils.reshape(num, num, 2)
+
+    seq_model = opt_model.seq_model
+    if n_workers is None:
+        output_fct, rayerr_fct = _trace_safe_filters(output_filter,
+                                                     rayerr_filter)
+        ray_results = (_trace_filtered(seq_model, pt0, d, wvl,
+                                       output_fct, rayerr_fct,
+                                       check_apertures=True, **kwargs)
+                       for d in dir0)
+    else:
+        ray_results = iter(_trace_safe_parallel(seq_model, pt0, dir0, wvl,
+                                                output_filter, rayerr_filter,
+                                                n_workers,
+                                                check_apertures=True,
+                                                **kwargs))
+    # choose how the ray results are added to the grid once, rather than
+    #  for every ray. A ray_result of None is a ray outside the pupil or a
+    #  failed ray.
+    if img_filter:
+        if append_if_none:
+            def add_ray(working_grid, pupil, ray_result):
+                working_grid.append(img_filter(pupil, ray_result))
+        else:
+            def add_ray(working_grid, pupil, ray_result):
+                result = img_filter(pupil, ray_result)
+                if ray_result is not None or result is not None:
+                    working_grid.append(result)
+    else:
+        if append_if_none:
+            def add_ray(working_grid, pupil, ray_result):
+                working_grid.append([pupil[0], pupil[1], ray_result])
+        else:
+            def add_ray(working_grid, pupil, ray_result):
+                if ray_result is not None:
+                    working_grid.append([pupil[0], pupil[1], ray_result])
+
     grid = []
     for i in range(num):
         if form == 'list':
@@ -444,30 +831,35 @@ def trace_grid(opt_model, grid_rng, fld, wvl, foc, img_filter=None,
             working_grid = grid_row
 
         for j in range(num):
-            pupil = np.array(start)
-            ray_result = trace_safe(opt_model, pupil, fld, wvl, 
-                                    output_filter, rayerr_filter, 
-                                    check_apertures=True, **kwargs)
-            if ray_result is not None:
-                if img_filter:
-                    result = img_filter(pupil, ray_result)
-                    working_grid.append(result)
-                else:
-                    working_grid.append([pupil[0], pupil[1], ray_result])
-            else:  # ray outside pupil or failed
-                if img_filter:
-                    result = img_filter(pupil, None)
-                    if result is not None or append_if_none:
-                        working_grid.append(result)
-                else:
-                    if append_if_none:
-                        working_grid.append([pupil[0], pupil[1], None])
-
-            start[1] += step[1]
+            add_ray(working_grid, pupils[i, j], next(ray_results))
+
         if form == 'grid':
             grid.append(grid_row)
-        start[0] += step[0]
-        start[1] = grid_rng[0][1]
+    return _grid_array(grid, form)
+
+
+def _grid_array(grid, form):
+    """ return the nested list grid from :func:`~.trace_grid` as an array
+
+    When every entry of the grid is a float array of the same shape, e.g.
+    [x, y, opd], the entries are stacked directly into the output array.
+    This avoids the slow discovery of the nested list structure by np.array,
+    which is used for all other grids.
+    """
+    if form == 'list':
+        entries = grid
+    elif len(grid) > 0 and all(len(row) == len(grid[0]) for row in grid):
+        entries = list(itertools.chain(*grid))
+    else:
+        entries = []
+    if len(entries) > 0:
+        e0 = entries[0]
+        if all(isinstance(e, np.ndarray) and e.dtype == np.float64 and
+               e.shape == e0.shape for e in entries):
+            out = np.stack(entries)
+            if form == 'grid':
+                out = out.reshape((len(grid), len(grid[0])) + e0.shape)
+            return out
     return np.array(grid)
 
 
@@ -527,10 +919,8 @@ def get_chief_ray_pkg(opt_model, fld, wvl, foc):
                 - dist: distance from interface to the exit pupil point
 
     """
-    if fld.chief_ray is None:
-        aim_chief_ray(opt_model, fld, wvl=wvl)
-        chief_ray_pkg = trace_chief_ray(opt_model, fld, wvl, foc)
-    elif fld.chief_ray[0][2] != wvl:
+    if fld.chief_ray is None or fld.chief_ray[0][2] != wvl:
+        # the chief ray is traced using the current fld.aim_pt
         chief_ray_pkg = trace_chief_ray(opt_model, fld, wvl, foc)
     else:
         chief_ray_pkg = fld.chief_ray
@@ -568,51 +958,19 @@ def trace_coddington_fan(opt_model, ray_pkg, foc=None):
     seq_model = opt_model.seq_model
     wl = seq_model.index_for_wavelength(ray_pkg.wvl)
 
-    path = itertools.zip_longest(ray_pkg.ray, seq_model.ifcs,
-                                 [n[wl] for n in seq_model.rndx],
-                                 seq_model.lcl_tfrms,
-                                 seq_model.z_dir)
-
-    before_rind = seq_model.rndx[0][wl]
-    before_dir = None
-    s_before, t_before = None, None
-    for r, ifc, after_rind, tfrm, z_dir in path:
-        after_rind = after_rind if after_rind is not None else before_rind
-        pt, after_dir, after_dst, normal = r
-        if before_dir is not None:
-            normal_len = norm(normal)
-            cosI_prime = np.dot(after_dir, normal)/normal_len
-            sinI_prime = math.sqrt(1.0 - cosI_prime**2)
-            sinI = after_rind*sinI_prime/before_rind
-            cosI = math.sqrt(1.0 - sinI**2)
-
-            obl_power = ifc.optical_power
-            if obl_power != 0.0:
-                obl_power *= ((after_rind*cosI_prime - before_rind*cosI) /
-                              (after_rind - before_rind))
-#                print("pwr, obl_pwr, after_dst:",
-#                      ifc.optical_power/(after_rind - before_rind),
-#                      obl_power, after_dst)
-#            else:
-#                print("pwr, obl_pwr, after_dst:",
-#                      ifc.optical_power, obl_power, after_dst)
-
-            n_by_s_prime = before_rind/s_before + obl_power
-            s_prime = after_rind/n_by_s_prime
-#            print("s, s':", s_before, s_prime)
-            s_before = s_prime - after_dst
-
-            n_cosIp2_by_t_prime = before_rind*cosI**2/t_before + obl_power
-            t_prime = after_rind*cosI_prime**2/n_cosIp2_by_t_prime
-#            print("t, t':", t_before, t_prime)
-            t_before = t_prime - after_dst
-        else:
-            s_before = -after_dst
-            t_before = -after_dst
+    ray = RayArray.from_ray(ray_pkg.ray)
+    # there is one gap index fewer than interfaces; the image interface
+    #  keeps the index preceding it
+    rndx = seq_model.get_rndx_array(wl)
+    num_ifcs = len(seq_model.ifcs)
+    if len(rndx) < num_ifcs:
+        rndx = np.pad(rndx, (0, num_ifcs - len(rndx)), mode='edge')
+    powers = np.array([ifc.optical_power for ifc in seq_model.ifcs])
 
-        before_rind = after_rind
-        before_dir = after_dir
+    s_prime, t_prime = _coddington_kernel(ray.dirs, ray.nrmls, ray.dsts,
+                                          rndx, powers)
 
+    pt, after_dir = ray.pts[-1], ray.dirs[-1]
     s_dfoc = s_prime*after_dir[2] + pt[2]
     t_dfoc = t_prime*after_dir[2] + pt[2]
     if foc is not None:
@@ -624,6 +982,59 @@ def trace_coddington_fan(opt_model, ray_pkg, foc=None):
     return s_dfoc, t_dfoc
 
 
+def _coddington_kernel(after_dirs, normals, after_dsts, rndx, powers):
+    """ trace the s and t Coddington equations along a ray
+
+    The inputs are arrays with an entry for each interface: the ray direction
+    and distance following the interface, the surface normal, the refractive
+    index following the interface and the interface optical power. The loop
+    is written in terms of scalars; the 3-vectors are too short for numpy
+    calls to pay for themselves.
+
+    Returns:
+        tuple: the sagittal and tangential image distances, s' and t', from
+        the last interface
+    """
+    after_dirs = after_dirs.tolist()
+    normals = normals.tolist()
+    after_dsts = after_dsts.tolist()
+    powers = powers.tolist()
+    # the indices are left as numpy floats so a zero index difference (e.g.
+    #  at a mirror) yields an inf rather than a ZeroDivisionError
+
+    s_before = t_before = -after_dsts[0]
+    before_rind = rndx[0]
+    s_prime, t_prime = None, None
+    for i in range(1, len(after_dsts)):
+        dx, dy, dz = after_dirs[i]
+        nx, ny, nz = normals[i]
+        after_dst = after_dsts[i]
+        after_rind = rndx[i]
+
+        normal_len = math.sqrt(nx*nx + ny*ny + nz*nz)
+        cosI_prime = (dx*nx + dy*ny + dz*nz)/normal_len
+        sinI_prime = math.sqrt(1.0 - cosI_prime*cosI_prime)
+        sinI = after_rind*sinI_prime/before_rind
+        cosI = math.sqrt(1.0 - sinI*sinI)
+
+        obl_power = powers[i]
+        if obl_power != 0.0:
+            obl_power *= ((after_rind*cosI_prime - before_rind*cosI) /
+                          (after_rind - before_rind))
+
+        n_by_s_prime = before_rind/s_before + obl_power
+        s_prime = after_rind/n_by_s_prime
+        s_before = s_prime - after_dst
+
+        n_cosIp2_by_t_prime = before_rind*cosI*cosI/t_before + obl_power
+        t_prime = after_rind*cosI_prime*cosI_prime/n_cosIp2_by_t_prime
+        t_before = t_prime - after_dst
+
+        before_rind = after_rind
+
+    return s_prime, t_prime
+
+
 def intersect_2_lines(P1, V1, P2, V2):
     """ intersect 2 non-parallel lines, returning distance from P1
 
@@ -632,8 +1043,20 @@ def intersect_2_lines(P1, V1, P2, V2):
     `Weisstein, Eric W. "Line-Line Intersection." From MathWorld--A Wolfram Web
     Resource. <http://mathworld.wolfram.com/Line-LineIntersection.html>`_
     """
-    Vx = np.cross(V1, V2)
-    s = np.dot(np.cross(P2 - P1, V1), Vx)/np.dot(Vx, Vx)
+    # the cross and dot products are written out in scalar form; this is
+    #  much faster than numpy calls on 3-vectors
+    P1x, P1y, P1z = P1
+    V1x, V1y, V1z = V1
+    P2x, P2y, P2z = P2
+    V2x, V2y, V2z = V2
+    Vxx = V1y*V2z - V1z*V2y
+    Vxy = V1z*V2x - V1x*V2z
+    Vxz = V1x*V2y - V1y*V2x
+    Dx, Dy, Dz = P2x - P1x, P2y - P1y, P2z - P1z
+    Cx = Dy*V1z - Dz*V1y
+    Cy = Dz*V1x - Dx*V1z
+    Cz = Dx*V1y - Dy*V1x
+    s = (Cx*Vxx + Cy*Vxy + Cz*Vxz)/(Vxx*Vxx + Vxy*Vxy + Vxz*Vxz)
     return s
 
 
@@ -659,10 +1082,6 @@ def trace_astigmatism_curve(opt_model, num_points=21, **kwargs):
     max_field = osp['fov'].max_field()[0]
     for f in np.linspace(0., max_field, num=num_points):
         fld.y = f
-        ref_sphere, cr_pkg = setup_pupil_coords(opt_model, fld, wvl, foc)
-        fld.chief_ray = cr_pkg
-        fld.ref_sphere = ref_sphere
-        
         s_foc, t_foc = trace_astigmatism(opt_model, fld, wvl, foc, **kwargs)
         s_data.append(s_foc)
         t_data.append(t_foc)
@@ -688,20 +1107,18 @@ def trace_astigmatism(opt_model, fld, wvl, foc, dx=0.001, dy=0.001):
     Returns:
         tuple: sagittal and tangential focus shifts at **fld**
     """
-    rlist = []
-    rlist.append(RayPkg(*trace_base(opt_model, [0., 0.], fld, wvl)))
-    rlist.append(RayPkg(*trace_base(opt_model, [dx, 0.], fld, wvl)))
-    rlist.append(RayPkg(*trace_base(opt_model, [0., dy], fld, wvl)))
-    rlist.append(RayPkg(*trace_base(opt_model, [-dx, 0.], fld, wvl)))
-    rlist.append(RayPkg(*trace_base(opt_model, [0., -dy], fld, wvl)))
-
-    s = intersect_2_lines(rlist[1].ray[-1][mc.p], rlist[1].ray[-1][mc.d],
-                          rlist[3].ray[-1][mc.p], rlist[3].ray[-1][mc.d])
-    s_foc = s * rlist[1].ray[-1][mc.d][2]
+    # the foci are found from the close ray pairs alone, the chief ray
+    #  itself isn't needed
+    pupils = np.array([[dx, 0.], [0., dy], [-dx, 0.], [0., -dy]])
+    rlist = trace_base_batch(opt_model, pupils, fld, wvl)
 
-    t = intersect_2_lines(rlist[2].ray[-1][mc.p], rlist[2].ray[-1][mc.d],
-                          rlist[4].ray[-1][mc.p], rlist[4].ray[-1][mc.d])
-    t_foc = t * rlist[2].ray[-1][mc.d][2]
+    s = intersect_2_lines(rlist[0].ray[-1][mc.p], rlist[0].ray[-1][mc.d],
+                          rlist[2].ray[-1][mc.p], rlist[2].ray[-1][mc.d])
+    s_foc = s * rlist[0].ray[-1][mc.d][2]
+
+    t = intersect_2_lines(rlist[1].ray[-1][mc.p], rlist[1].ray[-1][mc.d],
+                          rlist[3].ray[-1][mc.p], rlist[3].ray[-1][mc.d])
+    t_foc = t * rlist[1].ray[-1][mc.d][2]
 
     if foc is not None:
         focus_shift = foc
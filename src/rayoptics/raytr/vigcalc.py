@@ -148,7 +148,8 @@ def calc_vignetting_for_field(opm, fld, wvl):
     fld.vly = vig_factors[3]
 
 
-def calc_vignetted_ray(opm, xy, start_dir, fld, wvl, max_iter_count=10):
+def calc_vignetted_ray(opm, xy, start_dir, fld, wvl, max_iter_count=10,
+                       edge_step=1e-6):
     """ Find the limiting aperture and return the vignetting factor. 
 
     Args:
@@ -159,6 +160,8 @@ def calc_vignetted_ray(opm, xy, start_dir, fld, wvl, max_iter_count=10):
         fld: :class:`~.Field` point for wave aberration calculation
         wvl: wavelength of ray (nm)
         max_iter_count: fail-safe limit on aperture search
+        edge_step: relative inward step for a ray that is blocked again at
+                   the interface whose edge it was iterated to
 
     Returns:
         (**vig**, **last_indx**, **ray_pkg**)
@@ -185,7 +188,11 @@ def calc_vignetted_ray(opm, xy, start_dir, fld, wvl, max_iter_count=10):
             ray_pkg = te.ray_pkg
             # print(f"{xy_str[xy]} = {rel_p1[xy]:10.6f}: blocked at {indx}")
             if indx == last_indx:
-                still_iterating = False
+                # the ray iterated onto the edge of ifcs[indx] is still
+                #  blocked there by a hair; move it inward so that an
+                #  aperture further along the path gets a chance to block it
+                rel_p1[xy] *= 1.0 - edge_step
+                still_iterating = True
             else:
                 r_target = sm.ifcs[indx].surface_od()
                 rel_p1 = iterate_pupil_ray(opm, indx, xy, rel_p1[xy], r_target, 
@@ -88,6 +88,7 @@ class SequentialModel:
         # data for a wavelength vs index vs gap data arrays
         self.wvlns = []  # sampling wavelengths in nm
         self.rndx = []  # refractive index vs wv and gap
+        self._reset_caches()
 
         if do_init:
             self._initialize_arrays()
@@ -99,8 +100,15 @@ class SequentialModel:
         del attrs['lcl_tfrms']
         del attrs['wvlns']
         del attrs['rndx']
+        del attrs['_rndx_cache']
+        del attrs['_path_cache']
         return attrs
 
+    def _reset_caches(self):
+        """ clear the data derived from the sequence and rndx lists """
+        self._rndx_cache = {}
+        self._path_cache = {}
+
     def _initialize_arrays(self):
         """ initialize object and image interfaces and intervening gap """
         # add object interface
@@ -155,6 +163,7 @@ class SequentialModel:
         except IndexError:
             self.wvlns = self.opt_model['osp']['wvls'].wavelengths
             self.rndx = self.calc_ref_indices_for_spectrum(self.wvlns)
+            self._reset_caches()
             rndx = [n[wl_idx] for n in self.rndx[start:stop:step]]
 
         path = itertools.zip_longest(self.ifcs[start:stop:step],
@@ -164,6 +173,20 @@ class SequentialModel:
                                      self.z_dir[start:stop:step])
         return path
 
+    def cached_path(self, wl=None):
+        """ returns the path for the full sequence at `wl` as a list
+
+        The list is cached until the model is updated; don't modify it. Use
+        ``iter(cached_path(wl))`` where an iterator is needed.
+        """
+        if wl is None:
+            wl = self.central_wavelength()
+        path = self._path_cache.get(wl)
+        if path is None:
+            path = list(self.path(wl))
+            self._path_cache[wl] = path
+        return path
+
     def reverse_path(self, wl=None, start=None, stop=None, step=-1):
         """ returns an iterable path tuple for a range in the sequential model
     
@@ -228,6 +251,18 @@ class SequentialModel:
         self.wvlns = spectral_region.wavelengths
         return self.wvlns.index(wvl)
 
+    def get_rndx_array(self, wl_idx):
+        """ returns an array of the gap refractive indices at `wl_idx`
+
+        The array is cached until the model is updated and is read-only.
+        """
+        rndx = self._rndx_cache.get(wl_idx)
+        if rndx is None:
+            rndx = np.array([n[wl_idx] for n in self.rndx], dtype=np.float64)
+            rndx.flags.writeable = False
+            self._rndx_cache[wl_idx] = rndx
+        return rndx
+
     def central_rndx(self, i):
         """ returns the central refractive index of the model's ``WvlSpec`` """
         spectral_region = self.opt_model['optical_spec'].spectral_region
@@ -257,6 +292,7 @@ class SequentialModel:
             self.gaps.append(node)
         else:
             self.ifcs.insert(len(self.ifcs)-1, node)
+        self._reset_caches()
         return self
 
     def insert(self, ifc, gap, z_dir=1, prev=False):
@@ -287,6 +323,7 @@ class SequentialModel:
         wvls = self.opt_model.optical_spec.spectral_region.wavelengths
         rindex = [gap.medium.rindex(w) for w in wvls]
         self.rndx.insert(idx, rindex)
+        self._reset_caches()
 
         if ifc.interact_mode == 'reflect':
             self.update_reflections(start=idx)
@@ -338,6 +375,7 @@ class SequentialModel:
         del self.gaps[idx]
         del self.z_dir[idx]
         del self.rndx[idx]
+        self._reset_caches()
 
     def remove_node(self, e_node):
         part_tree = self.opt_model.part_tree
@@ -355,6 +393,7 @@ class SequentialModel:
             del self.rndx[idx]
             del self.lcl_tfrms[idx]
             del self.gbl_tfrms[idx]
+        self._reset_caches()
 
     def add_surface(self, surf_data, **kwargs):
         """ add a surface where `surf_data` is a list that contains:
@@ -427,6 +466,8 @@ class SequentialModel:
         if not hasattr(self, 'do_apertures'):
             self.do_apertures = True
 
+        self._reset_caches()
+
     def update_model(self, **kwargs):
         # delta n across each surface interface must be set to some
         #  reasonable default value. use the index at the central wavelength
@@ -463,6 +504,7 @@ class SequentialModel:
 
         self.gbl_tfrms = self.compute_global_coords()
         self.lcl_tfrms = self.compute_local_transforms()
+        self._reset_caches()
 
     def update_optical_properties(self, **kwargs):
         if self.do_apertures:
@@ -478,6 +520,7 @@ class SequentialModel:
 
         self.gbl_tfrms = self.compute_global_coords()
         self.lcl_tfrms = self.compute_local_transforms()
+        self._reset_caches()
 
     def flip(self, idx1: int, idx2: int) -> None:
         """Flip interfaces and gaps from *idx1* thru *idx2*."""
@@ -538,6 +581,7 @@ class SequentialModel:
                 if g:
                     g.apply_scale_factor(-1)
                     self.z_dir[i] = -z_dir
+        self._reset_caches()
 
     def get_rndx_and_imode(self):
         """ get list of signed refractive index and interact mode for sequence. """